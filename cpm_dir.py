@@ -1,67 +1,101 @@
-import re
-import math
+import struct
+
+# 32 byte directory entry layout: St F0-F7 E0-E2 Xl Bc Xh Rc Al[16]
+# Al holds 16 byte-values or 8 double-byte-values (little endian)
+_ENTRY_8 = struct.Struct('<B8s3sBBBB16B')
+_ENTRY_16 = struct.Struct('<B8s3sBBBB8H')
+
+# characters not allowed in file names and types
+_FN_BAD = str.maketrans('', '', '<>.,;:=?*[]')
+_FT_BAD = str.maketrans('', '', '.')
+
+# ascii upper case translation table
+_UPPER = bytes.maketrans(b'abcdefghijklmnopqrstuvwxyz',
+                         b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+# 16-bit block pointer layouts, by number of pointers
+_BLOCKS16 = {}
+
+
+def _blocks16(count):
+    layout = _BLOCKS16.get(count)
+    if layout is None:
+        layout = _BLOCKS16[count] = struct.Struct(f'<{count}H')
+    return layout
 
-EMPTY_ALLOCATION = [0] * 16
 
 class CPMDirectoryEntry:
     """ CP/M Directory Entry
         Manages CPM Directory Entries
     """
+    __slots__ = ('status', '_filename_b', '_filetype_b', 'extent_low',
+                 'reserved', 'extent_high', 'record_count',
+                 'block_allocation', 'extent_number', 'use_16bit')
+
     def __init__(self, use_16bit, user_number=0, filename="", filetype="", extent_low=0, extent_high=0, record_count=0, block_allocation=None):
 
+        assert 0 <= user_number <= 0xFF, "user number out of range"
+        assert 0 <= record_count <= 0xFF, "record count out of range"
+
         filename, filetype = self.sanitize(filename, filetype)
 
         self.status = user_number                  # [0]    1 byte
-        self.filename = filename.upper().ljust(8)  # [1-09] 8 bytes
-        self.filetype = filetype.upper().ljust(3)  # [9-11] 3 bytes
+        # name and type are kept encoded and padded, ready to be packed
+        self._filename_b = filename.encode('ascii').translate(_UPPER).ljust(8, b' ')  # [1-09] 8 bytes
+        self._filetype_b = filetype.encode('ascii').translate(_UPPER).ljust(3, b' ')  # [9-11] 3 bytes
         self.extent_low = extent_low               # [12]   1 byte
         self.reserved = 0                          # [13]   1 byte
         self.extent_high = extent_high             # [14]   1 byte
         self.record_count = record_count           # [15]   1 byte
-        self.block_allocation = block_allocation if block_allocation else EMPTY_ALLOCATION
-        self.extent = (32 * extent_high) + extent_low  # assume exm = 0
+        # each entry owns its allocation list, never share a default one
+        slots = 8 if use_16bit else 16
+        if block_allocation is None:
+            block_allocation = [0] * slots
+        elif len(block_allocation) < slots:
+            block_allocation = list(block_allocation)
+            block_allocation += [0] * (slots - len(block_allocation))
+        self.block_allocation = block_allocation
+        # Xl bits 0-4 and Xh bits 0-5 hold the extent number
+        self.extent_number = ((extent_high & 0x3F) << 5) | (extent_low & 0x1F)
 
         # use 16 bit block allocation
         self.use_16bit = use_16bit
 
+    @property
+    def filename(self):
+        return self._filename_b.decode('ascii')
+
+    @property
+    def filetype(self):
+        return self._filetype_b.decode('ascii')
+
     def sanitize(self, filename, filetype):
         # sanitize filename and filetype
         # They may consist of any printable 7 bit ASCII
         # character but: < > . , ; : = ? * [ ].
         # The file name must not be empty
         # remove "<>.,;:=?*[]" from filename
-        filename = re.sub(r'[<>.,;:=?*\[\]]', '', filename)
-        filetype = re.sub(r'[.]', '', filetype)
-        return filename,filetype
+        return filename.translate(_FN_BAD), filetype.translate(_FT_BAD)
 
     def to_bytes(self, use_16bit=False):
         # Transform the directory entry to a bytearray
-        try:
-            entry = bytearray([self.status])
-            entry += self.filename.encode('ascii')
-            entry += self.filetype.encode('ascii')
-            entry += bytearray([self.extent_low, self.extent_high])
-            entry.append(self.reserved)
-            entry.append(self.record_count)
-            # Convert block_allocation to bytes based on use_16bit
-            if use_16bit:
-                entry += bytearray(CPMDirectoryEntry.encode16(self.block_allocation))
-            else:
-                entry += bytearray(self.block_allocation)
-        except Exception as e:
-            print(f"Error decoding directory entry: {e}")
-            print(f"Entry: {self}")
-            raise e
+        layout = _ENTRY_16 if use_16bit else _ENTRY_8
+        entry = bytearray(32)
+        layout.pack_into(entry, 0,
+                         self.status,
+                         self._filename_b,
+                         self._filetype_b,
+                         self.extent_low,
+                         self.reserved,
+                         self.extent_high,
+                         self.record_count,
+                         *self.block_allocation)
         return entry
 
     def is_unused(self):
         # Check if the directory entry is unused        
         return self.status == 0xE5
 
-    def extent_number(self):
-        # Adjust according to bit usage
-        return (self.extent_high << 5) + (self.extent_low & 0x1F)
-
     def get_block_number(self, index):
         # Assuming block numbers are stored in two consecutive bytes
         if 2*index+1 < len(self.block_allocation):
@@ -77,65 +111,71 @@ class CPMDirectoryEntry:
     @staticmethod
     def from_bytes(use_16bit, data):
         # Create a CPMDirectoryEntry object from a bytearray
-        user_number = data[0]
-        filename = data[1:9].decode('ascii').rstrip()
-        filetype = data[9:12].decode('ascii').rstrip()
-        extent_low = data[12]
-        reserved = data[13]
-        extent_high = data[14]
-        record_count = data[15]
-        
-        if use_16bit:
-            block_allocation = CPMDirectoryEntry.decode16(data[16:32])
-        else:
-            block_allocation = list(data[16:32])
+        return CPMDirectoryEntry.from_record(use_16bit, data, 0)
+
+    @staticmethod
+    def from_record(use_16bit, data, index):
+        # Create a CPMDirectoryEntry object from the entry number index
+        # of a whole directory area, without slicing it
+        layout = _ENTRY_16 if use_16bit else _ENTRY_8
+        return CPMDirectoryEntry.from_fields(
+            use_16bit, layout.unpack_from(data, index * 32))
+
+    @staticmethod
+    def from_fields(use_16bit, fields):
+        # Create a CPMDirectoryEntry object from the unpacked entry fields
+        (user_number, filename, filetype,
+         extent_low, reserved, extent_high, record_count,
+         *block_allocation) = fields
+        filename = filename.rstrip(b' \x00').decode('ascii')
+        filetype = filetype.rstrip(b' \x00').decode('ascii')
         return CPMDirectoryEntry(use_16bit, user_number, filename, filetype, extent_low, extent_high, record_count, block_allocation)
 
+    @staticmethod
+    def iter_fields(use_16bit, data):
+        # Iterate over the unpacked fields of every entry in a directory area
+        layout = _ENTRY_16 if use_16bit else _ENTRY_8
+        return layout.iter_unpack(data)
+
     @staticmethod
     def encode16(block_list):
         # Encode a list of block numbers as a bytearray
-        ba = bytearray()
-        for block in block_list:
-            # Append each 16-bit block number as two bytes (little-endian format)
-            ba.extend(block.to_bytes(2, 'little'))
-        return ba
+        # of 16-bit little-endian values
+        layout = _blocks16(len(block_list))
+        return bytearray(layout.pack(*block_list))
 
     @staticmethod
     def decode16(data):
-        # Decode a bytearray into a list of block numbers
-        block_list = []
-        # Iterate through the bytearray two bytes at a time
-        for i in range(0, len(data), 2):
-            # Read two bytes from the bytearray, interpret them as a little-endian integer
-            block = int.from_bytes(data[i:i+2], 'little')
-            # Append the integer to the list
-            block_list.append(block)
-        return block_list
+        # Decode a bytearray of 16-bit little-endian values
+        # into a list of block numbers
+        layout = _blocks16(len(data) // 2)
+        return list(layout.unpack_from(data, 0))
 
     @classmethod    
     def create_entries_for_file(cls, filename, filetype, data_length, disk):
         # Create directory entries for a file
         entries = []
 
-        blocks_per_entry = 8 if disk.use_16bit else 16
-
-        # adjust based on actual block size and records per block
-        records_per_extent = disk.block_size * blocks_per_entry
+        blocks_per_entry = disk.blocks_per_entry
+        records_per_extent = disk.records_per_extent
 
-        num_blocks = math.ceil(data_length / disk.block_size)
-        num_extents = math.ceil(num_blocks / blocks_per_entry)
+        # integer ceiling divisions
+        num_blocks = -(-data_length // disk.block_size)
+        num_extents = -(-num_blocks // blocks_per_entry)
         
         # find free blocks
-        disk.read_directory()
+        disk.ensure_directory_loaded()
         blocks = disk.find_free_blocks(num_blocks)
 
-        for i in range(num_extents):
-            record_count = math.ceil(min(
-                data_length, records_per_extent) / disk.sector_size)
+        # zero pad the last extent and split the blocks in one row per extent
+        blocks += [0] * (num_extents * blocks_per_entry - num_blocks)
+        rows = zip(*[iter(blocks)] * blocks_per_entry)
+
+        for i, block_allocation in enumerate(rows):
+            record_count = -(-min(
+                data_length, records_per_extent) // disk.sector_size)
             data_length -= record_count * disk.sector_size
-            block_allocation = blocks[i * blocks_per_entry:i *
-                                      blocks_per_entry + blocks_per_entry]
-            
+
             # print(f"File: {filename}.{filetype} Extent: {i} Records: {record_count} Blocks: {block_allocation}")
 
             entries.append(cls(use_16bit=disk.use_16bit, 
@@ -143,7 +183,7 @@ class CPMDirectoryEntry:
                                filetype=filetype, 
                                extent_low=i,
                                record_count=record_count, 
-                               block_allocation=block_allocation))
+                               block_allocation=list(block_allocation)))
 
         return entries
 
@@ -1,12 +1,44 @@
 
 import os
-import math
+import sys
+import mmap
+import itertools
 
 from cpm_dir import CPMDirectoryEntry
 
 EMPTY_DIR = 0xE5
 EMPTY_BYTE = b'\x00'
 
+# printable view of a byte for dumps, control chars and space shown as '.'
+_ASCII_TABLE = bytes(b if b > 0x20 else ord('.') for b in range(256))
+
+
+def _read_host_file(path):
+    """ Read a host file to put on the disk, None if it can not be read."""
+    try:
+        with open(path, 'rb') as f:
+            if hasattr(os, 'posix_fadvise'):
+                # the file is read once front to back, let the
+                # kernel read ahead of us
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                except OSError:
+                    # only a hint, not every file supports it
+                    pass
+            return f.read()
+    except OSError as e:
+        print(f"Error reading file {path}")
+        print(e)
+        return None
+
+
+def _write_host_file(path, data):
+    """ Write a file extracted from the disk to the host."""
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
 class CPMDisk:
     def __init__(self, drivename, tracks, sectors_per_track, sector_size, block_size, bsh, drm, off):
         self.drivename = drivename
@@ -19,15 +51,14 @@ class CPMDisk:
         self.off = off
 
         self.size = tracks * sectors_per_track * sector_size
-
-        # calculate the total number of usable blocks on the disk
-        # only for reference purposes (not used)
-        self.phisical_blocks = (tracks * sectors_per_track *
-                                sector_size) / block_size
+        # bytes per track
+        self.track_size = sectors_per_track * sector_size
 
         # reserved blocks - blocks begins after this tracks
         self.off_blocks = (self.off * self.sectors_per_track *
                            self.sector_size) // block_size
+        # position of block 0 when reading blocks
+        self.blocks_start = self.off_blocks * block_size
 
         # calculate the start of the directory (this are counted as blocks)
         # block 0 starts directory
@@ -35,12 +66,10 @@ class CPMDisk:
 
         # Each directory entry is 32 bytes
         self.directory_size = self.drm * 32
-        self.directory_blocks = math.ceil(self.directory_size / block_size)
+        self.directory_blocks = -(-self.directory_size // block_size)
 
         # use only full blocks
-        self.total_blocks = int(self.phisical_blocks)
-        # if self.phisical_blocks % 1 == 0 else int(
-        #    self.phisical_blocks)
+        self.total_blocks = self.size // block_size
 
         # self.dir_block = self.directory_size // block_size
 
@@ -54,9 +83,24 @@ class CPMDisk:
         self.first_usable_block = self.total_blocks - self.total_usable_blocks + 1
 
         self.sectors_per_block = block_size // sector_size
+        # unused blocks are zero filled, unused entries are the empty entry
+        self._empty_block = EMPTY_BYTE * block_size
+        self._empty_dir_entry = bytes(CPMDirectoryEntry.empty_entry())
         self.use_16bit = self.total_usable_blocks > 255
+        # block pointers per directory entry and bytes addressed by one entry
+        self.blocks_per_entry = 8 if self.use_16bit else 16
+        self.records_per_extent = block_size * self.blocks_per_entry
         self.directory = []
-        
+        # directory entries must be read again before being used
+        self._directory_stale = True
+        # raw copy of the directory area, loaded on first access
+        self._dir_cache = None
+
+        # disk image memory map, opened on first access, read only
+        # until the first write so read only images can be inspected
+        self._image = None
+        self._image_writable = False
+
         self.debug = False
 
     def disk_info(self):
@@ -86,15 +130,17 @@ class CPMDisk:
         print(f"Size: {self.size} bytes")
 
     def initialize_disk(self):
+        # the image is about to be rewritten, drop the current mapping
+        self._unmap_image()
+        self._dir_cache = None
+        # let the file system zero fill the image
         with open(self.drivename, 'wb') as f:
-            f.write(EMPTY_BYTE * self.size)
-        # generate an empty directory
+            f.truncate(self.size)
+        # generate an empty directory with a single write
+        entry = CPMDirectoryEntry.empty_entry(self.use_16bit)
+        self.write_position(self.directory_start, entry * (self.drm + 1))
         self.directory = []
-        for entry_number in range(self.drm + 1):
-            entry = CPMDirectoryEntry.empty_entry(self.use_16bit)
-            self.write_directory_entry(
-                entry_number, entry) #.to_bytes(self.use_16bit))
-            self.directory.append(entry)
+        self._directory_stale = False
 
     # -------------------------
     # block management
@@ -112,29 +158,53 @@ class CPMDisk:
         # linear_sector_number = block * self.sectors_per_block
         # cpm calculates the linear sector number as follows:
         linear_sector_number = block << self.bsh
-        track = linear_sector_number // self.sectors_per_track
-        sector = linear_sector_number % self.sectors_per_track
-        return track, sector
+        return divmod(linear_sector_number, self.sectors_per_track)
 
     def track_sector_offset(self, track, sector):
         """ Convert track and sector to offset in the disk."""
-        offset = (track * self.sectors_per_track *
-                  self.sector_size) + (sector * self.sector_size)
-        return offset
+        return track * self.track_size + sector * self.sector_size
 
     def offset_to_track_sector(self, offset):
         """ Convert offset to track and sector."""
-        track = offset // (self.sectors_per_track * self.sector_size)
-        sector = (offset % (self.sectors_per_track *
-                  self.sector_size)) // self.sector_size
-        return track, sector
+        track, track_offset = divmod(offset, self.track_size)
+        return track, track_offset // self.sector_size
+
+    def _map_image(self, writable=False):
+        """ Memory map the disk image file, reusing the current mapping."""
+        if writable and not self._image_writable:
+            # first write, replace the read only mapping
+            self._unmap_image()
+        if self._image is None:
+            if writable:
+                with open(self.drivename, 'r+b') as f:
+                    self._image = mmap.mmap(f.fileno(), 0)
+            else:
+                with open(self.drivename, 'rb') as f:
+                    self._image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._image_writable = writable
+        return self._image
+
+    def _unmap_image(self):
+        """ Release the disk image mapping."""
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+            self._image_writable = False
+
+    def flush(self):
+        """ Flush changes made to the disk image to the file."""
+        if self._image is not None:
+            self._image.flush()
+
+    def close(self):
+        """ Flush and release the disk image."""
+        self.flush()
+        self._unmap_image()
 
     def read_position(self, position, size):
         """ Read data from a position in the disk."""
         try:
-            with open(self.drivename, 'rb') as f:
-                f.seek(position)
-                return f.read(size)
+            return self._map_image()[position:position + size]
         except Exception as e:
             print(f"DiskError: Error reading position {position:08x} - {size} bytes")
             print(e)
@@ -143,9 +213,7 @@ class CPMDisk:
     def write_position(self, position, data):
         """ Write data to a position in the disk."""
         try: 
-            with open(self.drivename, 'r+b') as f:
-                f.seek(position)
-                f.write(data)
+            self._map_image(writable=True)[position:position + len(data)] = data
         except Exception as e:
             print(f"DiskError: Error writing position {position:08x} - {len(data)} bytes")
             print(e)
@@ -153,7 +221,7 @@ class CPMDisk:
 
     def read_block(self, block_number):
         """ Read a block from the disk."""
-        position = (block_number + self.off_blocks) * self.block_size
+        position = block_number * self.block_size + self.blocks_start
         if self.debug:
             print(f"Reading block {block_number} {position:08x}")        
         return self.read_position(position, self.block_size)
@@ -163,6 +231,9 @@ class CPMDisk:
         if len(data) > self.block_size:
             raise ValueError("Data exceeds block size")
         position = (block_number * self.block_size) + self.directory_start
+        if block_number < self.directory_blocks:
+            # writing over the directory area, drop its copy
+            self._drop_directory_cache()
         if self.debug:
             print(f"Writing block {block_number} {position:08x} len {len(data)}")        
         # Pad data to full block size
@@ -177,30 +248,81 @@ class CPMDisk:
     def read_directory(self):
         """ Read the directory entries from the disk."""
         self.directory = []
-        for entry_number in range(self.drm):
-            entry_data = self.read_directory_entry(entry_number)
-            if entry_data[0] != EMPTY_DIR:
+        self._load_dir_cache()
+        area = self._dir_cache
+        # walk the status bytes and unpack only the used entries
+        for entry_number, status in enumerate(area[::32]):
+            if status != EMPTY_DIR:
                 try:
-                    entry = CPMDirectoryEntry.from_bytes(
-                        self.use_16bit, entry_data)
+                    entry = CPMDirectoryEntry.from_record(
+                        self.use_16bit, area, entry_number)
                     self.directory.append(entry)
                 except Exception as e:
-                    print(entry)
-                    print(entry_data)
+                    print(area[entry_number * 32:(entry_number + 1) * 32])
                     print(
                         f"Error reading directory entry {entry_number}/{self.drm}")
                     print(e)
+        self._directory_stale = False
+
+    def ensure_directory_loaded(self):
+        """ Read the directory entries only if the disk directory changed.
+            operations call it when they first need the directory, so
+            callers do not have to read it up front.
+        """
+        if self._directory_stale:
+            self.read_directory()
+
+    def _load_dir_cache(self):
+        """ Read the whole directory area from the disk at once."""
+        self._dir_cache = bytearray(
+            self.read_position(self.directory_start, self.drm * 32))
+
+    def _drop_directory_cache(self):
+        """ Forget the directory copy after a raw write over the directory area."""
+        self._dir_cache = None
+        self._directory_stale = True
+
+    def _overlaps_directory(self, position, size):
+        """ Check if a raw write touches the directory area."""
+        return (position < self.directory_start + self.directory_size and
+                position + size > self.directory_start)
+
+    def read_directory_area(self):
+        """ Get the raw directory area, read from the disk only once."""
+        if self._dir_cache is None:
+            self._load_dir_cache()
+        return self._dir_cache
 
     def find_free_directory_entry(self):
         """ Find a free directory entry."""
-        for entry_number in range(self.drm):
-            entry_data = self.read_directory_entry(entry_number)
-            if entry_data[0] == EMPTY_DIR:
-                return entry_number
-        return None
+        # scan only the status byte of each entry
+        entry_number = self.read_directory_area()[::32].find(EMPTY_DIR)
+        return entry_number if entry_number >= 0 else None
+
+    def entries_matching(self, filename, filetype):
+        """ Get the directory entry numbers used by a file."""
+        area = self.read_directory_area()
+        try:
+            name = (filename.upper().encode('ascii').ljust(8)[:8] +
+                    filetype.upper().encode('ascii').ljust(3)[:3])
+        except UnicodeEncodeError:
+            # directory names are ascii, no entry can match
+            return []
+        entry_numbers = []
+        position = area.find(name)
+        while position != -1:
+            entry_number, field = divmod(position, 32)
+            # name must be at the filename field of a file entry (user 0-31)
+            if field == 1 and area[position - 1] < 32:
+                entry_numbers.append(entry_number)
+            position = area.find(name, position + 1)
+        return entry_numbers
 
     def read_directory_entry(self, entry_number):
         """ Read a directory entry from the disk."""
+        if entry_number < self.drm:
+            start = entry_number * 32
+            return bytes(self.read_directory_area()[start:start + 32])
         position = self.directory_start + entry_number * 32
         # Read only the first 32 bytes for the directory entry
         return self.read_position(position, 32)
@@ -209,59 +331,81 @@ class CPMDisk:
         """ Write a directory entry to the disk."""
         position = self.directory_start + entry_number * 32
         self.write_position(position, entry_data)
+        if self._dir_cache is not None and entry_number < self.drm:
+            start = entry_number * 32
+            self._dir_cache[start:start + len(entry_data)] = entry_data
+        self._directory_stale = True
+
+    def write_directory_area(self, area):
+        """ Write the whole directory area to the disk at once."""
+        self.write_position(self.directory_start, area)
+        self._dir_cache = bytearray(area)
+        self._directory_stale = True
 
     def get_ditectory_entry_from_block(self, block_number):
         """ Get the directory entry number for a block number."""
-        for entry_number in range(self.drm):
-            entry_data = self.read_directory_entry(entry_number)
-            entry = CPMDirectoryEntry.from_bytes(self.use_16bit, entry_data)
+        area = self.read_directory_area()
+        for entry_number, status in enumerate(area[::32]):
+            if status == EMPTY_DIR:
+                continue
+            entry = CPMDirectoryEntry.from_record(
+                self.use_16bit, area, entry_number)
             if block_number in entry.block_allocation:
                 return entry_number
         return None
 
+    def _build_block_to_entry_map(self):
+        """ Map each allocated block to the first directory entry using it."""
+        block_to_entry = {}
+        area = self.read_directory_area()
+        all_fields = CPMDirectoryEntry.iter_fields(self.use_16bit, area)
+        for entry_number, fields in enumerate(all_fields):
+            if fields[0] == EMPTY_DIR:
+                continue
+            # fields[7:] are the block pointers
+            for block in fields[7:]:
+                if block != 0:
+                    block_to_entry.setdefault(block, entry_number)
+        return block_to_entry
+
     def is_valid_entry_data(self, entry_data):
         """ Check if the directory entry data is valid."""
         return entry_data[0] != EMPTY_DIR
 
     def get_used_blocks_from_directory(self):
         """ Get a list of used blocks from the directory entries. """
-        used_blocks = []
-        for entry in self.directory:
-            for block in entry.block_allocation:
-                if block != 0:
-                    used_blocks.append(block)
-        return used_blocks
+        self.ensure_directory_loaded()
+        return [block
+                for entry in self.directory
+                for block in entry.block_allocation
+                if block != 0]
 
     def get_blocks_status_from_directory(self):
-        """ Get a list true-free/false-occupied for each block status. """
+        """ Get a bitmap 1-free/0-occupied with each block status. """
         # Initialize all blocks as free
-        block_status = [True] * (self.total_usable_blocks + 1)
+        block_status = bytearray(b'\x01') * (self.total_usable_blocks + 1)
         used_blocks = self.get_used_blocks_from_directory()
         if self.debug:
             print(f"Used blocks: {used_blocks}")
-        # Mark first blocks as False
-        for block in range(0, self.directory_blocks):
-            # print(f"Marking block {block} as False")
-            block_status[block] = False
+        # Mark directory blocks as occupied
+        block_status[:self.directory_blocks] = bytes(self.directory_blocks)
 
-        # Mark used blocks as False
+        # Mark used blocks as occupied
         for block in used_blocks:
             if 0 < block <= self.total_usable_blocks:
-                block_status[block] = False
+                block_status[block] = 0
         return block_status
 
     def find_free_blocks(self, number_of_blocks):
-        number = self.get_blocks_status_from_directory()
+        block_status = self.get_blocks_status_from_directory()
         free_blocks = []
 
-        for number, status in enumerate(number):
-            if status:
-                free_blocks.append(number)
-                number_of_blocks -= 1
-            if number_of_blocks == 0:
-                break
+        block = block_status.find(1)
+        while block != -1 and len(free_blocks) < number_of_blocks:
+            free_blocks.append(block)
+            block = block_status.find(1, block + 1)
 
-        if number_of_blocks > 0:
+        if len(free_blocks) < number_of_blocks:
             raise Exception("Not enough free space on the disk")
 
         return free_blocks
@@ -277,12 +421,13 @@ class CPMDisk:
             len(data) + self.block_size - 1) // self.block_size
 
         blocks = []
-        for block_number in range(self.first_usable_block, self.total_blocks):
-            if len(blocks) >= blocks_needed:
-                break
-            block_data = self.read_block(block_number)
-            if block_data == EMPTY_DIR * self.block_size:
-                blocks.append(block_number)
+        with memoryview(self._map_image()) as image:
+            for block_number in range(self.first_usable_block, self.total_blocks):
+                if len(blocks) >= blocks_needed:
+                    break
+                position = block_number * self.block_size + self.blocks_start
+                if image[position:position + self.block_size] == self._empty_block:
+                    blocks.append(block_number)
 
         if len(blocks) < blocks_needed:
             raise Exception("Not enough free space on the disk")
@@ -290,7 +435,7 @@ class CPMDisk:
 
     def write_file(self, filename, filetype, data):
         """ Write a file to the disk."""
-        self.read_directory()
+        self.ensure_directory_loaded()
         # Create directory entries
         entries = CPMDirectoryEntry.create_entries_for_file(
             filename, 
@@ -300,19 +445,41 @@ class CPMDisk:
 
         blocks = []
         for entry in entries:
-            blocks.extend(entry.block_allocation)
-
-        # Write the file data to the allocated blocks
-        for i, block in enumerate(blocks):
-            start = i * self.block_size
-            end = start + self.block_size
-            self.write_block(block, data[start:end])
-
-        # create directory entries
+            # skip the zero padding of the last extent
+            blocks.extend(block for block in entry.block_allocation if block)
+
+        # Write the file data to the allocated blocks, one write
+        # for each run of consecutive blocks
+        runs = itertools.groupby(enumerate(blocks), key=lambda p: p[1] - p[0])
+        with memoryview(data) as view:
+            for _, run in runs:
+                run = list(run)
+                first_index, first_block = run[0]
+                run_size = len(run) * self.block_size
+                start = first_index * self.block_size
+                position = (first_block * self.block_size) + self.directory_start
+                if self.debug:
+                    print(f"Writing blocks {first_block}-{run[-1][1]} {position:08x} len {run_size}")
+                chunk = view[start:start + run_size]
+                self.write_position(position, chunk)
+                if len(chunk) < run_size:
+                    # Pad data to full blocks from the shared empty block
+                    self.write_position(position + len(chunk),
+                                        self._empty_block[:run_size - len(chunk)])
+
+        # create directory entries in free slots and flush the
+        # directory area with a single write
+        area = bytearray(self.read_directory_area())
         for entry in entries:
-            num_entry = self.find_free_directory_entry()
-            self.write_directory_entry(
-                num_entry, entry.to_bytes(self.use_16bit))
+            num_entry = area[::32].find(EMPTY_DIR)
+            if num_entry < 0:
+                raise Exception("Not enough free directory entries")
+            area[num_entry * 32:(num_entry + 1) * 32] = entry.to_bytes(
+                self.use_16bit)
+        self.write_directory_area(area)
+        # keep the loaded directory in step instead of reading it again
+        self.directory.extend(entries)
+        self._directory_stale = False
 
         if self.debug:
             print(f"Writing file {filename} {filetype} {blocks}")
@@ -320,20 +487,30 @@ class CPMDisk:
     def read_file(self, filename, filetype):
         entries = []        
         print(f"Reading file {filename}.{filetype}")
-        for entry_number in range(self.drm):
+        for entry_number in self.entries_matching(filename, filetype):
             entry_data = self.read_directory_entry(entry_number)
-            entry = CPMDirectoryEntry.from_bytes(self.use_16bit, entry_data)
-            if entry.filename.strip() == filename.upper() and entry.filetype.strip() == filetype.upper():
-                entries.append(entry)
+            entries.append(
+                CPMDirectoryEntry.from_bytes(self.use_16bit, entry_data))
 
         if len(entries) > 0:
-            file_data = bytearray()
+            blocks = []
             for entry in entries:
                 for block in entry.block_allocation:
                     if block == 0:
                         break
-                    file_data.extend(self.read_block(block))
-            return bytes(file_data)        
+                    blocks.append(block)
+            # fill a buffer allocated once for the whole file, copying
+            # straight from the mapped image without a buffer per block
+            block_size = self.block_size
+            file_data = bytearray(len(blocks) * block_size)
+            with memoryview(self._map_image()) as image:
+                for i, block in enumerate(blocks):
+                    position = block * block_size + self.blocks_start
+                    if self.debug:
+                        print(f"Reading block {block} {position:08x}")
+                    start = i * block_size
+                    file_data[start:start + block_size] = image[position:position + block_size]
+            return file_data
         return None
         
 
@@ -341,19 +518,58 @@ class CPMDisk:
         """ Put a file on the disk."""
         # load a file into the disk
         try:
-            with open(filename, 'rb') as f:
-                data = f.read()
-            # extract the file name and extension
-            # without path
-            file_name, file_type = os.path.splitext(os.path.basename(filename))
-            if self.debug:
-                print(f"Putting file {file_name} with extension {file_type}")
-            self.write_file(file_name.strip(), file_type.strip("."), data)
+            data = _read_host_file(filename)
+            if data is None:
+                exit(1)
+            self.put_data(filename, data)
         except Exception as e:
             print(f"Error reading file {filename}")
             print(e)
             exit(1)
 
+    def put_files(self, paths):
+        """ Put several files on the disk and flush the image once.
+            host files are read in parallel, they are written one by
+            one as they share the block allocation of the disk.
+        """
+        # imported here, listing or dumping a disk does not need them
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        workers = 16
+        paths = iter(paths)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # keep only a few reads in flight so a big tree of host
+            # files is never loaded in memory at once
+            pending = deque((filename, executor.submit(_read_host_file, filename))
+                            for filename in itertools.islice(paths, workers))
+            while pending:
+                filename, read = pending.popleft()
+                data = read.result()
+                if data is None:
+                    executor.shutdown(cancel_futures=True)
+                    exit(1)
+                # the oldest read succeeded, start the next one
+                for next_filename in itertools.islice(paths, 1):
+                    pending.append((next_filename, executor.submit(
+                        _read_host_file, next_filename)))
+                try:
+                    self.put_data(filename, data)
+                except Exception as e:
+                    print(f"Error writing file {filename}")
+                    print(e)
+                    executor.shutdown(cancel_futures=True)
+                    exit(1)
+        self.flush()
+
+    def put_data(self, filename, data):
+        """ Put the data of a host file, already read, on the disk."""
+        # extract the file name and extension
+        # without path
+        file_name, file_type = os.path.splitext(os.path.basename(filename))
+        if self.debug:
+            print(f"Putting file {file_name} with extension {file_type}")
+        self.write_file(file_name.strip(), file_type.strip("."), data)
+
     def get_file(self, filename):
         """ Get a file from the disk."""
         try:
@@ -370,20 +586,60 @@ class CPMDisk:
             print(e)
             exit(1)
 
+    def get_files(self, filenames):
+        """ Get several files from the disk.
+            files are read from the image one by one, the host files
+            are written in parallel.
+        """
+        filenames = list(filenames)
+        if not filenames:
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(16, len(filenames))) as executor:
+            pending = []
+            for filename in filenames:
+                try:
+                    file_name, file_type = os.path.splitext(os.path.basename(filename))
+                    data = self.read_file(file_name.strip(), file_type.strip("."))
+                except Exception as e:
+                    print(f"Error writing file {filename}")
+                    print(e)
+                    exit(1)
+                if data:
+                    pending.append((filename, len(data), executor.submit(
+                        _write_host_file, filename, data)))
+                else:
+                    pending.append((filename, 0, None))
+            # report in the requested order
+            for filename, size, write in pending:
+                if write is None:
+                    print(f"File '{filename}' not found.")
+                    continue
+                try:
+                    write.result()
+                except Exception as e:
+                    print(f"Error writing file {filename}")
+                    print(e)
+                    exit(1)
+                print(f"File {filename} written - size {size} bytes")
+
     def delete_file(self, filename):
         """ Delete a file from the disk."""
-        for entry_number in range(self.drm):
-            entry_data = self.read_directory_entry(entry_number)
-            entry = CPMDirectoryEntry.from_bytes(self.use_16bit, entry_data)
+        area = self.read_directory_area()
+        for entry_number, status in enumerate(area[::32]):
+            if status == EMPTY_DIR:
+                continue
+            entry = CPMDirectoryEntry.from_record(
+                self.use_16bit, area, entry_number)
             if entry.filename.strip() == filename.upper():
-                # Zero out the directory entry
-                self.write_directory_entry(entry_number, EMPTY_DIR * 32)
+                # Clear the directory entry
+                self.write_directory_entry(entry_number, self._empty_dir_entry)
 
                 # Optionally, zero out the data blocks
                 for block in entry.block_allocation:
                     if block == 0:
                         break
-                    self.write_block(block, EMPTY_DIR * self.block_size)
+                    self.write_block(block, self._empty_block)
                 return
         raise FileNotFoundError(f"File '{filename}' not found.")
 
@@ -397,9 +653,9 @@ class CPMDisk:
             data = f.read()
         if len(data) > 2048:
             raise ValueError("File too large for system file")
-        with open(self.drivename, 'r+b') as f:
-            f.seek(0)
-            f.write(data)
+        self.write_position(0, data)
+        if self._overlaps_directory(0, len(data)):
+            self._drop_directory_cache()
 
     def put_at_block(self, filename, block):
         """ Put a file on the disk starting at a block."""
@@ -421,9 +677,9 @@ class CPMDisk:
         with open(filename, 'rb') as f:
             data = f.read()
         print(f"Writing file {filename} at offset {offset} ...")
-        with open(self.drivename, 'r+b') as f:
-            f.seek(offset)
-            f.write(data)
+        self.write_position(offset, data)
+        if self._overlaps_directory(offset, len(data)):
+            self._drop_directory_cache()
         print(
             f"{filename} written at start 0x{offset:08x} - 0x{offset+len(data):08x} - len {len(data)} 0x{len(data):08x} bytes")
         return len(data)
@@ -433,64 +689,64 @@ class CPMDisk:
     # -------------------------
 
     def list_directory(self):
-        print("Directory Listing:")
-        print("-" * 110)
-        print(
-            f"{'Entry':<6} {'Usr':<3} {'Ext':<3} {'Filename':<9} {'Type':<5} {'Rec':<4} {'Blocks':<50} {'Size':<10}")
-        print("-" * 110)
+        lines = ["Directory Listing:",
+                 "-" * 110,
+                 f"{'Entry':<6} {'Usr':<3} {'Ext':<3} {'Filename':<9} {'Type':<5} {'Rec':<4} {'Blocks':<50} {'Size':<10}",
+                 "-" * 110]
         entries_used = 0
         entries_total = 0
+        # one format for all the block pointers of an entry
+        if self.use_16bit:
+            blocks_format = "%04x " * 8
+        else:
+            blocks_format = "%02x " * 16
 
+        area = self.read_directory_area()
         for entry_number in range(self.drm):
-            entry_data = self.read_directory_entry(entry_number)
-            if self.is_valid_entry_data(entry_data):
-                entry = CPMDirectoryEntry.from_bytes(
-                    self.use_16bit, entry_data)
+            if area[entry_number * 32] != EMPTY_DIR:
+                entry = CPMDirectoryEntry.from_record(
+                    self.use_16bit, area, entry_number)
                 if entry.filename.strip() != '':
-                    print(f"{entry_number:<6} {entry.status:<3} {entry.extent_number():<3} {entry.filename:<9} {entry.filetype:<5} {entry.record_count:02x} - ", end="")
-                    size = 0
-                    if self.use_16bit:
-                        for i in range(0, 8):
-                            print(f"{entry.block_allocation[i]:04x}", end=" ")
-                            if entry.block_allocation[i] != 0:
-                                size += self.block_size
-                    else:
-                        for i in range(0, 16):
-                            print(f"{entry.block_allocation[i]:02x}", end=" ")
-                            if entry.block_allocation[i] != 0:
-                                size += self.block_size
-                    print(f" - {size/1024:.2f} Kb")
+                    blocks = entry.block_allocation
+                    size = sum(self.block_size for block in blocks if block != 0)
+                    lines.append(
+                        f"{entry_number:<6} {entry.status:<3} {entry.extent_number:<3} {entry.filename:<9} {entry.filetype:<5} {entry.record_count:02x} - "
+                        + blocks_format % tuple(blocks)
+                        + f" - {size/1024:.2f} Kb")
                 entries_used += 1
             entries_total += 1
 
-        print("-" * 110)
-        print(f"Total entries: {entries_total} - Used entries: {entries_used}")
+        lines.append("-" * 110)
+        lines.append(f"Total entries: {entries_total} - Used entries: {entries_used}")
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def raw_directory(self):
-        print("Directory Listing:")
-        print("-" * 140)
+        lines = ["Directory Listing:",
+                 "-" * 140]
         entries_used = 0
         entries_total = 0
-        
+
         for entry_number in range(self.drm):
             entry_data = self.read_directory_entry(entry_number)
             if self.is_valid_entry_data(entry_data):
-                for byte in entry_data:
-                    print(f"{byte:02x}", end=" ")
-                print("  ", end="   ")
-                for byte in entry_data:
-                    print(f"{chr(byte) if byte > 0x20 else '.'}", end=" ")
-                print()
+                hex_part = entry_data.hex(' ')
+                ascii_part = ' '.join(
+                    entry_data.translate(_ASCII_TABLE).decode('latin-1'))
+                lines.append(f"{hex_part}      {ascii_part} ")
                 entries_used += 1
             entries_total += 1
 
-        print("-" * 110)
-        print(f"Total entries: {entries_total} - Used entries: {entries_used}")
+        lines.append("-" * 110)
+        lines.append(f"Total entries: {entries_total} - Used entries: {entries_used}")
+        sys.stdout.write("\n".join(lines) + "\n")
 
     def get_file_entry(self, filename):
-        for entry_number in range(self.drm):
-            entry_data = self.read_directory_entry(entry_number)
-            entry = CPMDirectoryEntry.from_bytes(self.use_16bit, entry_data)
+        area = self.read_directory_area()
+        for entry_number, status in enumerate(area[::32]):
+            if status == EMPTY_DIR:
+                continue
+            entry = CPMDirectoryEntry.from_record(
+                self.use_16bit, area, entry_number)
             if entry.filename.strip() == filename.upper():
                 return entry
         return None
@@ -515,50 +771,44 @@ class CPMDisk:
         print("-" * 70)
         print("Block:  Status:")
         print("-" * 70)
-        for block in range(self.total_blocks):
-            block_data = self.read_block(block)
-            if block_data == b'\x00' * self.block_size:
-                status = "Free"
-            else:
-                status = "Used"
+        # compare every block against the zero block over the mapped image
+        with memoryview(self._map_image()) as image:
+            free = [image[position:position + self.block_size] == self._empty_block
+                    for position in range(self.blocks_start,
+                                          self.blocks_start + self.total_blocks * self.block_size,
+                                          self.block_size)]
+        for block, is_free in enumerate(free):
+            status = "Free" if is_free else "Used"
             print(f"{block:>6} {status}")
         print("-" * 70)
 
+    def _disk_map_header(self):
+        # sector numbers row, shared by the disk maps
+        return " "*26 + "".join([f"{sector:03d} " for sector in range(self.sectors_per_track)])
+
     def disk_map_visual(self):
         """ Display a visual map of the disk showing used and free blocks.
             an * indicates a used block, a . indicates a free block.
             in a matrix format.
         """
+        block_to_entry = self._build_block_to_entry_map()
+        first_usable_block = self.first_usable_block
+        sectors = range(self.sectors_per_track)
         block = 0
-        print(" "*26, end="")
-        for sector in range(self.sectors_per_track):
-            print(f"{sector:03d}", end=" ")
-        print("")
+        lines = [self._disk_map_header()]
         # a line for each track
         for track in range(self.tracks):
-            # a character for each sector
-            print(f"Track {track:02d} - {block:>6} 0x{block:04x}: ", end="")
-
-            for sector in range(self.sectors_per_track):
-                block = self.block(track, sector)
-                print(f"{block:>3}", end=" ")
-            print(f" 0x{block-1:04x}")
-
-            print(" "*26, end="")
-            for sector in range(self.sectors_per_track):
-                # block = track * self.sectors_per_track + sector
-                block = self.block(track, sector)
-                if block < self.first_usable_block:
-                    status = "R"
-                else:
-                    entry = self.get_ditectory_entry_from_block(block)
-                    if entry:
-                        status = entry
-                    else:
-                        status = "."
-
-                print(f"{status:>3}", end=" ")
-            print()
+            # block numbers of the track, computed once for both rows
+            blocks_in_track = [self.block(track, sector) for sector in sectors]
+            statuses = ["R" if b < first_usable_block else block_to_entry.get(b) or "."
+                        for b in blocks_in_track]
+            lines.append(f"Track {track:02d} - {block:>6} 0x{block:04x}: "
+                         + "".join(["%3s " % b for b in blocks_in_track])
+                         + f" 0x{blocks_in_track[-1]-1:04x}")
+            lines.append(" "*26 + "".join(["%3s " % s for s in statuses]))
+            block = blocks_in_track[-1]
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
 
     def disk_map_free(self):
         """ Display a visual map of the disk showing used and free blocks.
@@ -566,50 +816,40 @@ class CPMDisk:
             in a matrix format.
         """
         free_blocks = self.get_blocks_status_from_directory()
+        # blocks past the bitmap are shown as not available
+        last_block = len(free_blocks) - 1
+        sectors = range(self.sectors_per_track)
         block = 0
-        # print(free_blocks, len(free_blocks))
-        print(" "*26, end="")
-        for sector in range(self.sectors_per_track):
-            print(f"{sector:03d}", end=" ")
-        print("")
+        lines = [self._disk_map_header()]
         # a line for each track
         for track in range(self.tracks):
-            # a character for each sector
-            print(f"Track {track:02d} - {block:>6} 0x{block:04x}: ", end="")
-
-            for sector in range(self.sectors_per_track):
-                # block = track * self.sectors_per_track + sector
-                block = self.block(track, sector)
-                if block <= self.total_blocks:
-                    if free_blocks[block]:
-                        status = "."
-                    else:
-                        status = "*"
-                else:
-                    status = "-"
-                print(f"{status:>3}", end=" ")
-
-            print()
+            blocks_in_track = [self.block(track, sector) for sector in sectors]
+            statuses = [("." if free_blocks[b] else "*") if b <= last_block else "-"
+                        for b in blocks_in_track]
+            lines.append(f"Track {track:02d} - {block:>6} 0x{block:04x}: "
+                         + "".join(["%3s " % s for s in statuses]))
+            block = blocks_in_track[-1]
+        lines.append("")
+        sys.stdout.write("\n".join(lines))
 
     def dump_block(self, block_number):
         block_data = self.read_block(block_number)
         offset = block_number * self.block_size
-        print(f"Block {block_number} - Offset 0x{offset:08x} - Size {len(block_data)} bytes")
+        lines = [f"Block {block_number} - Offset 0x{offset:08x} - Size {len(block_data)} bytes"]
+        # hex and ascii columns of the whole block, converted at once
+        # and sliced for each row (3 hex characters per byte)
+        hex_data = block_data.hex(' ')
+        ascii_data = block_data.translate(_ASCII_TABLE).decode('latin-1')
         t, s = 0, 0
         # show block in 32 bytes chunks
         for i in range(0, len(block_data), 32):
             track, sector = self.offset_to_track_sector(offset + i)
             if t != track or s != sector:
                 t, s = track, sector
-                print(f"Track {track:02d} 0x{track:02x} Sector {sector:02d} 0x{sector:02x}")
-            
-            print(f" 0x{offset + i:08x} :: ", end="")
+                lines.append(f"Track {track:02d} 0x{track:02x} Sector {sector:02d} 0x{sector:02x}")
+
             # show 32 bytes in hex and ascii
-            for j in range(i, i + 32):
-                print(f"{block_data[j]:02x}", end=" ")
-            print(" ", end="")
-            for j in range(i, i + 32):
-                print(f"{chr(block_data[j]) if block_data[j] > 0x20 else '.'}", end="")
-            print("")
-
-        
\ No newline at end of file
+            hex_part = hex_data[i * 3:(i + 32) * 3 - 1]
+            ascii_part = ascii_data[i:i + 32]
+            lines.append(f" 0x{offset + i:08x} :: {hex_part}  {ascii_part}")
+        sys.stdout.write("\n".join(lines) + "\n")
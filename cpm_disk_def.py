@@ -1,7 +1,13 @@
 """read and write disk definitions to a file defaulting to diskdefs"""
 
+import re
+
 import cpm_disk
 
+# a "def <title>" ... "end" block and its "<key> <value>" lines
+_DEF_BLOCK = re.compile(r'^\s*def\s+(\S+)\s*$(.*?)^\s*end\b', re.M | re.S)
+_DEF_PARAM = re.compile(r'(\w+)\s+(\d+)')
+
 
 class CPMDiskDefinition:
     """ Reads and writes disk definitions to a file defaulting to diskdefs """
@@ -22,22 +28,21 @@ class CPMDiskDefinition:
 
     def read_cpm_defs(self):
         """ Reads disk definitions from a file """
-        current_title = None
-        current_data = {}
-
         with open(self.filename, 'r', encoding='utf-8') as file:
-            for line in file:
-                stripped_line = line.strip()
-                if stripped_line.startswith('def'):
-                    _, title = stripped_line.split()
-                    current_title = title
-                    current_data = {}
-                elif stripped_line.startswith('end'):
-                    self.cpm_defs[current_title] = current_data
-                else:
-                    if stripped_line:
-                        key, value = stripped_line.split()
-                        current_data[key] = int(value)
+            text = file.read()
+        for match in _DEF_BLOCK.finditer(text):
+            title, body = match.groups()
+            params = {}
+            for line in body.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                param = _DEF_PARAM.fullmatch(line)
+                if param is None:
+                    raise ValueError(
+                        f"Invalid line in disk definition {title}: {line}")
+                params[param.group(1)] = int(param.group(2))
+            self.cpm_defs[title] = params
 
     def get_disk(self, def_name, filename):
         if def_name in self.cpm_defs:
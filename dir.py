@@ -24,5 +24,5 @@ if __name__ == "__main__":
         disk.disk_map_visual()
         disk.disk_map_free()
         disk.dump_block(0)
-        
-        
+
+    disk.close()
@@ -1,10 +1,14 @@
 import sys
 import os
-from argparse import ArgumentParser
 
-from cpm_disk_def import CPMDiskDefinition
+
+def block_number(value):
+    """ Block number for --dump, decimal or with a 0x / 0o prefix."""
+    return int(value, 0)
+
 
 if __name__ == "__main__":
+    from argparse import ArgumentParser
 
     # parse arguments to get the directory where are the files to add
     parser = ArgumentParser()
@@ -20,8 +24,8 @@ if __name__ == "__main__":
                         default=False, action="store_true")
     parser.add_argument("-s", "--show", help="Show directory",
                         default=False, action="store_true")
-    parser.add_argument("-db", "--dump", help="Dump a block (hex)",
-                        default=0, type=str)
+    parser.add_argument("-db", "--dump", help="Dump a block (decimal, 0x hex)",
+                        default=None, type=block_number)
     parser.add_argument(
         "-i", "--img", help="Image file. With -f image will be created", required=True)
     parser.add_argument("-v", "--verbose", help="Verbose output",
@@ -29,6 +33,9 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    # the disk modules are loaded only once the arguments are valid
+    from cpm_disk_def import CPMDiskDefinition
+
     diskdef = CPMDiskDefinition()
 
     # print definitions
@@ -43,7 +50,12 @@ if __name__ == "__main__":
         print(f"Creating disk image {args.img} of type {args.type}")
         disk.initialize_disk()
 
-    disk.read_directory()
+    # collect every source file first, then write them all to the
+    # image, so a bad directory is reported before the image is touched
+    # (name shown, path) pairs
+    sources = []
+    # real paths already collected, a file given twice is added once
+    seen = set()
 
     # args directory is the source or list sources directory
     if args.dir:
@@ -52,30 +64,48 @@ if __name__ == "__main__":
             if not os.path.exists(directory):
                 print(f"Error: Directory {directory} does not exist")
                 sys.exit(1)
-            # get all files in the source directory
-            files = [f for f in os.listdir(directory) if os.path.isfile(
-                os.path.join(directory, f))]
-            for file in files:
-                if file.startswith("."):
-                    continue
-                print(f"** Adding file: {file}")
-                disk.put_file(os.path.join(directory, file))
+            # resolved once for the directory, not for each file
+            real_directory = os.path.realpath(directory)
+            # get all files in the source directory, scandir already
+            # knows the entry types so no stat is needed for each file
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    if entry.is_symlink():
+                        # the link target is the file that may be given twice
+                        real_path = os.path.realpath(entry.path)
+                    else:
+                        real_path = os.path.join(real_directory, entry.name)
+                    if real_path not in seen:
+                        seen.add(real_path)
+                        sources.append((entry.name, entry.path))
 
     if args.add:
         print(f"Adding files: {args.add}")
         for file in args.add:
-            print(f"** Adding file: {file}")
-            disk.put_file(file)
+            # one stat for each file, fail before the image is touched
+            if not os.path.isfile(file):
+                print(f"Error: File {file} does not exist")
+                sys.exit(1)
+            real_path = os.path.realpath(file)
+            if real_path not in seen:
+                seen.add(real_path)
+                sources.append((file, file))
+
+    # announce all the files with a single write
+    sys.stdout.write("".join(f"** Adding file: {file}\n" for file, _ in sources))
+    disk.put_files(path for _, path in sources)
 
     if args.extract:
         print(f"Extracting files: {args.extract}")
-        for file in args.extract:
-            print(f"** Extract file: {file}")
-            disk.get_file(file)
+        sys.stdout.write("".join(f"** Extract file: {file}\n" for file in args.extract))
+        disk.get_files(args.extract)
 
     if args.dir or args.add or args.extract or args.show:
         disk.list_directory()        
         
-    if args.dump:
-        block = int(args.dump, 16)
-        disk.dump_block(block)
+    if args.dump is not None:
+        disk.dump_block(args.dump)
+
+    disk.close()
@@ -1,4 +1,4 @@
-from cpmdisk import CPMDisk
+from cpm_disk import CPMDisk
 
 
 if __name__ == "__main__":
@@ -9,10 +9,12 @@ if __name__ == "__main__":
                    128,     # 128 bytes per sector
                    1024,    # 1024 bytes per block (1 block = 8 sectors)
                    3,       # bsh - block shift
-                   7,       # blm - block mask
-                   242,     # dsm - max data blocks
                    64,      # drm - max directory entries
                    2)       # off - reserved tracks
-        
+
+    # both scans are served from the same memory map of the image,
+    # opened on first access and released by close
     disk.disk_map_free()
-    disk.directory()
+    disk.read_directory()
+    disk.list_directory()
+    disk.close()